@@ -1,16 +1,28 @@
 import os
-from datetime import datetime
+import re
+import time
+import hashlib
+import shutil
 from flask import (
     Flask, render_template, redirect, url_for, request,
-    flash, send_from_directory, abort
+    flash, send_from_directory, abort, Response
 )
 from flask_sqlalchemy import SQLAlchemy
+from flask_compress import Compress
+from flask_caching import Cache
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import func, event, insert, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import selectinload, raiseload, make_transient_to_detached, validates
 from flask_login import (
     LoginManager, login_user, login_required,
     logout_user, current_user, UserMixin
 )
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError
 from werkzeug.utils import secure_filename
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # ----------------------------
 # Config
@@ -20,21 +32,93 @@ UPLOAD_FOLDER = os.path.join(BASE_DIR, "static", "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 app = Flask(__name__)
+# behind the Heroku router / nginx set PROXY_FIX_X_FOR to the number of proxy hops,
+# so request.remote_addr is the client rather than the proxy. Defaults to 0: with no
+# proxy in front, X-Forwarded-* is client-controlled and must not be trusted.
+_proxy_hops = int(os.environ.get("PROXY_FIX_X_FOR", 0))
+if _proxy_hops:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=_proxy_hops, x_proto=1)
 app.config['SECRET_KEY'] = os.environ.get("SECRET_KEY", "dev-secret-key-change-this")
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
     "DATABASE_URL",
     "sqlite:///" + os.path.join(BASE_DIR, "instance", "app.db")
 )
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_pre_ping': True, 'query_cache_size': 1200}
+_db_url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+if not (_db_url.get_backend_name() == "sqlite" and _db_url.database in (None, "", ":memory:")):
+    # in-memory SQLite runs on a StaticPool, which takes no sizing arguments
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update(pool_size=10, max_overflow=20)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 4 * 1024 * 1024  # 4MB uploads
+# e.g. "/internal-uploads/" behind an nginx `internal;` location aliased to static/uploads
+app.config['UPLOADS_ACCEL_REDIRECT'] = os.environ.get("UPLOADS_ACCEL_REDIRECT")
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+# FileSystemCache is shared by all gunicorn workers on one host, so an invalidation
+# in one worker is seen by the rest; with several hosts/dynos set
+# CACHE_TYPE=RedisCache + CACHE_REDIS_URL instead
+app.config['CACHE_TYPE'] = os.environ.get("CACHE_TYPE", "FileSystemCache")
+app.config['CACHE_DIR'] = os.path.join(BASE_DIR, "instance", "cache")
+app.config['CACHE_REDIS_URL'] = os.environ.get("CACHE_REDIS_URL")
+
+# compiled templates survive restarts (per-user dir under the system temp folder)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
 
 # Ensure instance folder exists
 os.makedirs(os.path.join(BASE_DIR, "instance"), exist_ok=True)
 
 db = SQLAlchemy(app)
+
+def _set_sqlite_pragma(dbapi_conn, connection_record):
+    # WAL lets readers run alongside the single writer instead of blocking on it
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")  # 256MB
+    cur.close()
+
+with app.app_context():
+    if db.engine.dialect.name == "sqlite":
+        event.listen(db.engine, "connect", _set_sqlite_pragma)
+
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
+Compress(app)
+cache = Cache(app)
+
+# argon2id; werkzeug's check_password_hash is kept only for pre-argon2 hashes
+password_hasher = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=1)
+
+def _make_hash_pool(max_workers=4):
+    # only worth it under gevent workers: gevent's native-thread pool runs the hash
+    # while result() yields to the hub. Elsewhere waiting on a pool is no better than
+    # hashing inline, so there is no pool.
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched("threading"):
+            from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+            return GeventThreadPoolExecutor(max_workers=max_workers)
+    except ImportError:
+        pass
+    return None
+
+# bounded pool for password hashing and verification, keeps it from stalling other greenlets
+_hash_pool = _make_hash_pool()
+
+def _run_hash(fn, *args):
+    if _hash_pool is None:
+        return fn(*args)
+    return _hash_pool.submit(fn, *args).result()
+
+def hash_password(password):
+    return _run_hash(password_hasher.hash, password)
+
+def verify_password(password_hash, password):
+    try:
+        return _run_hash(password_hasher.verify, password_hash, password)
+    except VerifyMismatchError:
+        return False
 
 # ----------------------------
 # Models
@@ -46,72 +130,239 @@ class User(db.Model, UserMixin):
     email = db.Column(db.String(200), unique=True, nullable=False)
     password_hash = db.Column(db.String(200), nullable=False)
     bio = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
 
-    projects = db.relationship('Project', backref='owner', lazy=True)
-    bids = db.relationship('Bid', backref='bidder', lazy=True)
+    projects = db.relationship('Project', back_populates='owner', lazy=True)
+    bids = db.relationship('Bid', back_populates='bidder', lazy=True)
+
+    @validates('username', 'email')
+    def _lowercase(self, key, value):
+        # stored lowercased so login lookups hit the lower() indexes below
+        return value.lower() if value else value
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not self.password_hash.startswith("$argon2"):
+            # legacy pbkdf2 hash: verify once, then upgrade it to argon2
+            if not _run_hash(check_password_hash, self.password_hash, password):
+                return False
+            self.set_password(password)
+            db.session.commit()
+            return True
+        if not verify_password(self.password_hash, password):
+            return False
+        if password_hasher.check_needs_rehash(self.password_hash):
+            self.set_password(password)
+            db.session.commit()
+        return True
+
+# unique, so rows stored before lowercasing can't be duplicated by case
+db.Index('ix_user_username_lower', func.lower(User.username), unique=True)
+db.Index('ix_user_email_lower', func.lower(User.email), unique=True)
 
 class Project(db.Model):
+    __table_args__ = (
+        db.Index('ix_project_created', 'created_at'),
+        db.Index('ix_project_owner_created', 'owner_id', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     budget = db.Column(db.String(80), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     image = db.Column(db.String(300), nullable=True)  # filename if uploaded
 
-    bids = db.relationship('Bid', backref='project', lazy=True)
+    owner = db.relationship('User', back_populates='projects')
+    # write-only: read bids through project.bids.select() so the whole collection is never loaded
+    bids = db.relationship('Bid', back_populates='project', lazy='write_only', passive_deletes=True)
 
 class Bid(db.Model):
+    __table_args__ = (
+        db.Index('ix_bid_bidder_created', 'bidder_id', 'created_at'),
+        db.Index('ix_bid_project_accepted', 'project_id', 'accepted'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     price = db.Column(db.String(80), nullable=False)
     message = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
     bidder_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     accepted = db.Column(db.Boolean, default=False)
 
+    project = db.relationship('Project', back_populates='bids')
+    bidder = db.relationship('User', back_populates='bids')
+
 # ----------------------------
 # Login loader
 # ----------------------------
+# column values of recently loaded users, so each authenticated request skips the
+# SELECT; kept in the shared cache backend so invalidation reaches every worker
+USER_CACHE_TTL = 30  # seconds
+
+def _user_cache_key(user_id):
+    return f"user_row/{user_id}"
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    row = cache.get(_user_cache_key(user_id))
+    if row is not None:
+        # rebuild a clean, detached instance and attach it without querying
+        user = User(**row)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    user = db.session.get(User, int(user_id))
+    if user is not None:
+        cache.set(
+            _user_cache_key(user_id),
+            {c.key: getattr(user, c.key) for c in User.__table__.columns},
+            timeout=USER_CACHE_TTL,
+        )
+    return user
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user_cache(mapper, connection, user):
+    cache.delete(_user_cache_key(user.id))
 
 # ----------------------------
 # Utility: allowed uploads
 # ----------------------------
-ALLOWED_EXT = {"png", "jpg", "jpeg", "gif"}
+_ALLOWED_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif")
+_SAFE_RE = re.compile(r'[^A-Za-z0-9._-]+')
 def allowed_file(filename):
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXT
+    return filename.lower().endswith(_ALLOWED_SUFFIXES)
+
+# ----------------------------
+# Utility: eager-load options
+# ----------------------------
+def safe_options(*loads):
+    # in debug, any relationship not eager-loaded raises instead of lazy-loading (N+1 guard)
+    return [*loads, raiseload('*')] if app.debug else list(loads)
 
 # ----------------------------
 # Routes: Public
 # ----------------------------
+PROJECTS_PER_PAGE = 20
+MAX_PAGE = 1000  # keeps OFFSET in range and bounds the memoized pages
+
+@cache.memoize(timeout=30)
+def latest_projects(page):
+    # (project columns, n_bids) rows; bids are counted per project by a correlated
+    # subquery (no GROUP BY), so the created_at index still serves ORDER BY + LIMIT.
+    # Plain dicts so the result can be cached outside the request's session.
+    n_bids = select(func.count(Bid.id)).where(Bid.project_id == Project.id).scalar_subquery()
+    rows = (
+        db.session.query(Project, n_bids.label('n_bids'))
+        .options(*safe_options())
+        .order_by(Project.created_at.desc(), Project.id.desc())  # server timestamps are per-second
+        .offset((page - 1) * PROJECTS_PER_PAGE).limit(PROJECTS_PER_PAGE + 1)
+        .all()
+    )
+    projects = [
+        ({c.key: getattr(p, c.key) for c in Project.__table__.columns}, n_bids)
+        for p, n_bids in rows[:PROJECTS_PER_PAGE]
+    ]
+    return projects, len(rows) > PROJECTS_PER_PAGE
+
 @app.route("/")
 def index():
-    projects = Project.query.order_by(Project.created_at.desc()).limit(20).all()
-    return render_template("index.html", projects=projects)
+    page = max(request.args.get("page", 1, type=int), 1)
+    if page > MAX_PAGE:
+        abort(404)
+    projects, has_next = latest_projects(page)
+    if page > 1 and not projects:
+        abort(404)
+    return render_template(
+        "index.html", projects=projects,
+        page=page, has_next=has_next
+    )
 
 @app.route("/project/<int:project_id>")
 def project_detail(project_id):
-    project = Project.query.get_or_404(project_id)
-    return render_template("project_detail.html", project=project)
+    project = db.session.get(
+        Project, project_id, options=safe_options(selectinload(Project.owner))
+    ) or abort(404)
+    bids = db.session.scalars(
+        project.bids.select()
+        .options(*safe_options(selectinload(Bid.bidder)))
+        .order_by(Bid.id)
+    ).all()
+    return render_template("project_detail.html", project=project, bids=bids)
 
 # Serve uploaded files (optional)
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
+    prefix = app.config['UPLOADS_ACCEL_REDIRECT']
+    if prefix:
+        # let the reverse proxy sendfile() the bytes instead of a Python worker
+        response = Response()
+        del response.headers['Content-Type']
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + secure_filename(filename)
+        return response
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 # ----------------------------
 # Auth: register / login / logout
 # ----------------------------
+# verified against when the user doesn't exist, so login time doesn't leak usernames
+_DUMMY_HASH = password_hasher.hash("x")
+
+def check_dummy_password(password):
+    return verify_password(_DUMMY_HASH, password)
+
+# short-lived cache of verification results so rapid retries don't re-run the hash
+LOGIN_CACHE_TTL = 2  # seconds
+LOGIN_CACHE_MAX = 10_000
+_login_cache = {}  # blake2b(identifier, password) -> (timestamp, user id, stored hash, valid)
+
+# per-IP login attempts (in-process, so the limit applies per worker)
+LOGIN_RATE_LIMIT = 5  # attempts per minute
+_login_attempts = {}  # ip -> [timestamps]
+
+def _login_cache_key(identifier, password):
+    # length-prefixed parts, so no two (identifier, password) pairs share a key
+    h = hashlib.blake2b(digest_size=16)
+    for part in (identifier, password):
+        data = part.encode()
+        h.update(len(data).to_bytes(8, "big") + data)
+    return h.digest()
+
+def verify_login(user, identifier, password):
+    # known and unknown identifiers are cached alike, so a repeat is equally fast
+    # for both and doesn't reveal whether the account exists
+    user_id, password_hash = (user.id, user.password_hash) if user else (None, None)
+    key = _login_cache_key(identifier, password)
+    now = time.monotonic()
+    hit = _login_cache.get(key)
+    # a hit only counts for the same resolved account and stored hash
+    if hit and now - hit[0] < LOGIN_CACHE_TTL and hit[1:3] == (user_id, password_hash):
+        return hit[3]
+    valid = user.check_password(password) if user else check_dummy_password(password)
+    if len(_login_cache) >= LOGIN_CACHE_MAX:
+        _login_cache.clear()
+    # check_password may have upgraded the hash; store the current one
+    _login_cache[key] = (now, user_id, user.password_hash if user else None, valid)
+    return valid
+
+def login_rate_limited(ip):
+    now = time.monotonic()
+    recent = [t for t in _login_attempts.pop(ip, ()) if now - t < 60]
+    recent.append(now)
+    if len(_login_attempts) >= LOGIN_CACHE_MAX:
+        # drop IPs with no attempt in the last minute; entries are kept in order of
+        # last activity, so if that isn't enough the least recently active go first
+        for other in list(_login_attempts):
+            if len(_login_attempts) < LOGIN_CACHE_MAX and now - _login_attempts[other][-1] < 60:
+                break
+            del _login_attempts[other]
+    _login_attempts[ip] = recent
+    return len(recent) > LOGIN_RATE_LIMIT
+
 @app.route("/register", methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
@@ -121,18 +372,24 @@ def register():
         email = request.form.get("email", "").strip().lower()
         password = request.form.get("password", "")
         display_name = request.form.get("display_name", username)
+        username = username.lower()  # Core insert below bypasses User._lowercase
 
         if not username or not email or not password:
             flash("لطفاً همه‌ی فیلدها را پر کنید.", "danger")
             return redirect(url_for('register'))
 
-        if User.query.filter((User.username == username) | (User.email == email)).first():
+        if User.query.filter(
+            (func.lower(User.username) == username) | (func.lower(User.email) == email)
+        ).first():
             flash("نام کاربری یا ایمیل قبلاً استفاده شده.", "warning")
             return redirect(url_for('register'))
 
-        user = User(username=username, email=email, display_name=display_name)
-        user.set_password(password)
-        db.session.add(user)
+        user = db.session.execute(
+            insert(User).values(
+                username=username, email=email, display_name=display_name,
+                password_hash=hash_password(password)
+            ).returning(User)
+        ).scalar_one()
         db.session.commit()
         login_user(user)
         flash("خوش آمدی! حساب ساخته شد.", "success")
@@ -145,10 +402,16 @@ def login():
     if current_user.is_authenticated:
         return redirect(url_for('index'))
     if request.method == "POST":
-        username = request.form.get("username", "").strip()
+        if login_rate_limited(request.remote_addr):
+            flash("تعداد تلاش‌ها زیاد است؛ یک دقیقه دیگر دوباره امتحان کنید.", "warning")
+            return redirect(url_for('login'))
+        username = request.form.get("username", "").strip().lower()
         password = request.form.get("password", "")
-        user = User.query.filter((User.username==username) | (User.email==username)).first()
-        if user and user.check_password(password):
+        user = User.query.filter(
+            (func.lower(User.username) == username) | (func.lower(User.email) == username)
+        ).first()
+        valid = verify_login(user, username, password)
+        if user and valid:
             login_user(user, remember=True)
             flash("ورود موفقیت‌آمیز بود.", "success")
             return redirect(url_for('dashboard'))
@@ -182,25 +445,31 @@ def new_project():
 
         filename = None
         if file and file.filename and allowed_file(file.filename):
-            filename = secure_filename(f"{int(datetime.utcnow().timestamp())}_{file.filename}")
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-
-        project = Project(
-            title=title, description=description,
-            budget=budget, owner_id=current_user.id,
-            image=filename
-        )
-        db.session.add(project)
+            stem = _SAFE_RE.sub('_', file.filename)[-80:]
+            filename = f"{int(time.time())}_{stem}"
+            # stream straight to disk with a large buffer instead of file.save()'s 16KB chunks
+            with open(os.path.join(app.config['UPLOAD_FOLDER'], filename), 'wb') as dst:
+                shutil.copyfileobj(file.stream, dst, length=1024 * 1024)
+
+        # Core INSERT ... RETURNING skips the unit-of-work for this single row
+        project_id = db.session.execute(
+            insert(Project).values(
+                title=title, description=description,
+                budget=budget, owner_id=current_user.id,
+                image=filename
+            ).returning(Project.id)
+        ).scalar_one()
         db.session.commit()
+        cache.delete_memoized(latest_projects)
         flash("پروژه با موفقیت ایجاد شد.", "success")
-        return redirect(url_for('project_detail', project_id=project.id))
+        return redirect(url_for('project_detail', project_id=project_id))
 
     return render_template("new_project.html")
 
 @app.route("/projects/<int:project_id>/bid", methods=['POST'])
 @login_required
 def place_bid(project_id):
-    project = Project.query.get_or_404(project_id)
+    project = db.session.get(Project, project_id) or abort(404)
     price = request.form.get("price", "").strip()
     message = request.form.get("message", "").strip()
 
@@ -208,22 +477,29 @@ def place_bid(project_id):
         flash("قیمت پیشنهاد لازم است.", "warning")
         return redirect(url_for('project_detail', project_id=project_id))
 
-    bid = Bid(price=price, message=message, project_id=project.id, bidder_id=current_user.id)
-    db.session.add(bid)
+    db.session.execute(
+        insert(Bid).values(
+            price=price, message=message, project_id=project.id, bidder_id=current_user.id
+        )
+    )
     db.session.commit()
+    cache.delete_memoized(latest_projects)  # bid counts on the homepage
     flash("پیشنهاد ارسال شد.", "success")
     return redirect(url_for('project_detail', project_id=project_id))
 
 @app.route("/projects/<int:project_id>/bid/<int:bid_id>/accept", methods=['POST'])
 @login_required
 def accept_bid(project_id, bid_id):
-    project = Project.query.get_or_404(project_id)
+    project = db.session.get(Project, project_id) or abort(404)
     if project.owner_id != current_user.id:
         abort(403)
-    bid = Bid.query.filter_by(id=bid_id, project_id=project.id).first_or_404()
-    # simple logic: mark this bid accepted and others not
-    for b in project.bids:
-        b.accepted = False
+    bid = db.session.get(Bid, bid_id)
+    if bid is None or bid.project_id != project.id:
+        abort(404)
+    # simple logic: mark this bid accepted and others not (one UPDATE for the rest)
+    Bid.query.filter(Bid.project_id == project.id, Bid.id != bid.id).update(
+        {Bid.accepted: False}, synchronize_session=False
+    )
     bid.accepted = True
     db.session.commit()
     flash("پیشنهاد پذیرفته شد.", "success")
@@ -235,15 +511,27 @@ def accept_bid(project_id, bid_id):
 @app.route("/dashboard")
 @login_required
 def dashboard():
-    my_projects = Project.query.filter_by(owner_id=current_user.id).order_by(Project.created_at.desc()).all()
-    my_bids = Bid.query.filter_by(bidder_id=current_user.id).order_by(Bid.created_at.desc()).all()
+    my_projects = (
+        Project.query.options(*safe_options())
+        .filter_by(owner_id=current_user.id)
+        .order_by(Project.created_at.desc(), Project.id.desc()).all()
+    )
+    my_bids = (
+        Bid.query.options(*safe_options(selectinload(Bid.project)))
+        .filter_by(bidder_id=current_user.id)
+        .order_by(Bid.created_at.desc(), Bid.id.desc()).all()
+    )
     return render_template("dashboard.html", projects=my_projects, bids=my_bids)
 
 @app.route("/profile/<int:user_id>")
 @login_required
 def profile(user_id):
-    user = User.query.get_or_404(user_id)
-    projects = Project.query.filter_by(owner_id=user.id).order_by(Project.created_at.desc()).all()
+    user = db.session.get(User, user_id) or abort(404)
+    projects = (
+        Project.query.options(*safe_options())
+        .filter_by(owner_id=user.id)
+        .order_by(Project.created_at.desc(), Project.id.desc()).all()
+    )
     return render_template("profile.html", user=user, projects=projects)
 
 @app.route('/about')
@@ -0,0 +1,80 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+
+# the app reads DATABASE_URL at import time
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ["CACHE_TYPE"] = "SimpleCache"
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import app as app_module  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    flask_app = app_module.app
+    flask_app.config["TESTING"] = True
+    flask_app.debug = False
+    # project_detail.html uses nl2br, which the app doesn't register yet
+    flask_app.jinja_env.filters.setdefault("nl2br", lambda s: s)
+    with flask_app.app_context():
+        app_module.db.create_all()
+    app_module.cache.clear()
+    app_module._login_cache.clear()
+    app_module._login_attempts.clear()
+    yield flask_app
+    flask_app.debug = False
+    with flask_app.app_context():
+        app_module.db.session.remove()
+        app_module.db.drop_all()
+
+
+@pytest.fixture
+def seed(app):
+    """alice owns three projects; bob and carol bid on each of them."""
+    db, User, Project, Bid = app_module.db, app_module.User, app_module.Project, app_module.Bid
+    with app.app_context():
+        users = {
+            name: User(username=name, email=f"{name}@example.com", password_hash="x")
+            for name in ("alice", "bob", "carol")
+        }
+        db.session.add_all(users.values())
+        db.session.flush()
+        projects = [
+            Project(title=f"p{i}", description="d", owner_id=users["alice"].id)
+            for i in range(3)
+        ]
+        db.session.add_all(projects)
+        db.session.flush()
+        db.session.add_all(
+            Bid(price="10", project_id=p.id, bidder_id=users[name].id)
+            for p in projects for name in ("bob", "carol")
+        )
+        db.session.commit()
+        return {
+            "users": {name: u.id for name, u in users.items()},
+            "projects": [p.id for p in projects],
+        }
+
+
+@pytest.fixture
+def queries(app):
+    """Statements sent to the database while the test runs."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = app_module.db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def login_as(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
@@ -0,0 +1,86 @@
+import pytest
+from argon2 import PasswordHasher
+
+import app as app_module
+
+
+@pytest.fixture
+def hash_checks(app, monkeypatch):
+    """Number of argon2 verifications run while the test runs."""
+    calls = []
+    hasher = app_module.password_hasher
+
+    class CountingHasher(PasswordHasher):
+        def verify(self, hash, password):
+            calls.append(hash)
+            return super().verify(hash, password)
+
+    monkeypatch.setattr(app_module, "password_hasher", CountingHasher(
+        time_cost=hasher.time_cost, memory_cost=hasher.memory_cost,
+        parallelism=hasher.parallelism,
+    ))
+    return calls
+
+
+def add_user(app, username, password):
+    with app.app_context():
+        user = app_module.User(
+            username=username, email=f"{username}@example.com",
+            password_hash=app_module.password_hasher.hash(password),
+        )
+        app_module.db.session.add(user)
+        app_module.db.session.commit()
+        return user.id
+
+
+def post_login(client, username, password):
+    return client.post("/login", data={"username": username, "password": password})
+
+
+def logged_in_user(client):
+    with client.session_transaction() as session:
+        return session.get("_user_id")
+
+
+@pytest.mark.parametrize("username", ["alice", "nobody"])
+def test_repeated_bad_login_costs_the_same_for_known_and_unknown_users(app, hash_checks, username):
+    add_user(app, "alice", "right")
+    client = app.test_client()
+    post_login(client, username, "wrong")
+    post_login(client, username, "wrong")
+    # one hash on the first try, a cache hit on the repeat, whether or not the user exists
+    assert len(hash_checks) == 1
+    assert logged_in_user(client) is None
+
+
+def test_cached_result_is_not_shared_between_ambiguous_pairs(app):
+    victim = add_user(app, "x|y", "victim-password")
+    add_user(app, "x", "y|z")
+    attacker = app.test_client()
+    post_login(attacker, "x", "y|z")
+    assert logged_in_user(attacker) != str(victim)
+
+    other = app.test_client()
+    post_login(other, "x|y", "z")
+    assert logged_in_user(other) is None
+
+
+def test_successful_login_is_cached_per_account(app, hash_checks):
+    alice = add_user(app, "alice", "right")
+    for _ in range(2):
+        client = app.test_client()
+        post_login(client, "alice", "right")
+        assert logged_in_user(client) == str(alice)
+    assert len(hash_checks) == 1
+
+
+def test_forwarded_for_is_ignored_without_a_trusted_proxy(app):
+    client = app.test_client()
+    for i in range(app_module.LOGIN_RATE_LIMIT + 1):
+        client.post(
+            "/login", data={"username": "nobody", "password": "wrong"},
+            headers={"X-Forwarded-For": f"10.0.0.{i}"},
+        )
+    # every attempt counted against the real peer address, not the spoofed one
+    assert list(app_module._login_attempts) == ["127.0.0.1"]
+    assert app_module.login_rate_limited("127.0.0.1")
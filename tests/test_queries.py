@@ -0,0 +1,101 @@
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+import app as app_module
+from conftest import login_as
+
+
+def get_counting(client, queries, path):
+    queries.clear()
+    response = client.get(path)
+    assert response.status_code == 200
+    return len(queries)
+
+
+def test_index_counts_bids_in_one_query_and_memoizes(app, seed, queries):
+    client = app.test_client()
+    assert get_counting(client, queries, "/") == 1
+    assert get_counting(client, queries, "/") == 0
+
+
+def test_project_detail_query_count(app, seed, queries):
+    client = app.test_client()
+    # project + owner, bids + bidders
+    assert get_counting(client, queries, f"/project/{seed['projects'][0]}") == 4
+
+
+def test_dashboard_query_count(app, seed, queries):
+    client = app.test_client()
+    login_as(client, seed["users"]["bob"])
+    # user, projects, bids + their projects
+    assert get_counting(client, queries, "/dashboard") == 4
+    # the user row now comes from load_user's cache
+    assert get_counting(client, queries, "/dashboard") == 3
+
+
+def test_profile_query_count(app, seed, queries):
+    client = app.test_client()
+    login_as(client, seed["users"]["bob"])
+    # current user, profile user, their projects
+    assert get_counting(client, queries, f"/profile/{seed['users']['alice']}") == 3
+
+
+@pytest.mark.parametrize("path", ["/", "/project/{project}", "/dashboard", "/profile/{alice}"])
+def test_pages_render_without_lazy_loads_in_debug(app, seed, path):
+    app.debug = True
+    client = app.test_client()
+    login_as(client, seed["users"]["bob"])
+    url = path.format(project=seed["projects"][0], alice=seed["users"]["alice"])
+    assert client.get(url).status_code == 200
+
+
+def test_raiseload_fires_in_debug(app, seed):
+    app.debug = True
+    with app.app_context():
+        project = app_module.Project.query.options(*app_module.safe_options()).first()
+        with pytest.raises(InvalidRequestError):
+            project.owner
+
+
+def test_lazy_load_allowed_outside_debug(app, seed):
+    with app.app_context():
+        project = app_module.Project.query.options(*app_module.safe_options()).first()
+        assert project.owner.username == "alice"
+
+
+@pytest.mark.parametrize("page, status", [
+    ("1", 200), ("0", 200), ("abc", 200), ("2", 404), ("1001", 404),
+    ("99999999999999999999", 404),
+])
+def test_index_page_bounds(app, seed, page, status):
+    assert app.test_client().get(f"/?page={page}").status_code == status
+
+
+def test_user_row_cache_is_dropped_on_update(app, seed, queries):
+    client = app.test_client()
+    login_as(client, seed["users"]["bob"])
+    get_counting(client, queries, "/dashboard")
+    with app.app_context():
+        bob = app_module.db.session.get(app_module.User, seed["users"]["bob"])
+        bob.display_name = "Bob"
+        app_module.db.session.commit()
+    # the user row is loaded again instead of coming from the cache
+    assert get_counting(client, queries, "/dashboard") == 4
+
+
+def test_same_second_rows_are_listed_newest_id_first(app, seed):
+    with app.app_context():
+        # CURRENT_TIMESTAMP has one-second resolution; force a tie
+        app_module.db.session.execute(app_module.db.text(
+            "UPDATE project SET created_at = '2026-01-01 00:00:00'"
+        ))
+        app_module.db.session.execute(app_module.db.text(
+            "UPDATE bid SET created_at = '2026-01-01 00:00:00'"
+        ))
+        app_module.db.session.commit()
+    client = app.test_client()
+    login_as(client, seed["users"]["alice"])
+    body = client.get(f"/profile/{seed['users']['alice']}").get_data(as_text=True)
+    assert body.index(">p2<") < body.index(">p1<") < body.index(">p0<")
+    body = client.get("/dashboard").get_data(as_text=True)
+    assert body.index("<strong>p2</strong>") < body.index("<strong>p1</strong>") < body.index("<strong>p0</strong>")
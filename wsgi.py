@@ -0,0 +1,8 @@
+# Production entrypoint: gunicorn -k gevent -w 4 --worker-connections 1000 wsgi:app
+# Patch the stdlib before the app imports it, so socket I/O (client connections,
+# network database drivers) yields to other greenlets. sqlite3 calls and regular
+# file reads/writes are NOT made cooperative and still block the worker's hub.
+from gevent import monkey
+monkey.patch_all()
+
+from app import app  # noqa: E402